@@ -5,7 +5,7 @@ from .ciboost import model as CEBoost
 
 from .version import __version__
 
-__ALL__ = [
+__all__ = [
     "__version__",
     "EfnBoost",
     "HitBoost",
@@ -1,12 +1,15 @@
+import os
+import functools
+import importlib.util
+import numpy as np
 import pandas as pd
-from pkg_resources import resource_filename
 
 from .data_simulator import SimulatedData
 from .base import survival_stats
 from .base import survival_df
 from .base import survival_dmat
 
-__ALL__ = [
+__all__ = [
     "survival_stats",
     "survival_df",
     "survival_dmat",
@@ -21,14 +24,87 @@ __ALL__ = [
     "SimulatedData"
 ]
 
-def _load_dataset(filename, **kwargs):
+_METABRIC_DTYPES = {
+    "MKI67": np.float32,
+    "EGFR": np.float32,
+    "PGR": np.float32,
+    "ERBB2": np.float32,
+    "hormone": np.float32,
+    "radiotherapy": np.float32,
+    "chemotherapy": np.float32,
+    "ER_positive": np.float32,
+    "age": np.float32,
+    "e": np.int32,
+    "t": np.int32
+}
+
+_WHAS_DTYPES = {
+    "age": np.float32,
+    "gender": np.float32,
+    "bmi": np.float32,
+    "chf": np.float32,
+    "miord": np.float32,
+    "e": np.int32,
+    "t": np.int32
+}
+
+_DATASET_DTYPES = {
+    "metabric": _METABRIC_DTYPES,
+    "whas": _WHAS_DTYPES
+}
+
+# Columns of bundled datasets in file order, which dict order does not
+# guarantee before Python 3.7
+_DATASET_COLUMNS = {
+    "metabric": ["MKI67", "EGFR", "PGR", "ERBB2", "hormone", "radiotherapy",
+                 "chemotherapy", "ER_positive", "age", "e", "t"],
+    "whas": ["age", "gender", "bmi", "chf", "miord", "e", "t"]
+}
+
+# Directory of bundled datasets
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+# pyarrow is an optional dependency, and `read_csv` supports it since pandas 1.4
+_PYARROW_CSV = (importlib.util.find_spec("pyarrow") is not None and
+                tuple(int(v) for v in pd.__version__.split(".")[:2]) >= (1, 4))
+
+# Parsed bundled datasets, keyed by file name and loading arguments
+_DATASET_CACHE = {}
+
+def _cache_key(filename, kwargs):
+    """
+    Build a hashable cache key from loading arguments, or return None if
+    any argument is not made of plain values (str, int, bool, None, or a
+    list or tuple of them), e.g. callables or converters.
+    """
+    def _is_plain(v):
+        return v is None or isinstance(v, (str, int))
+
+    items = []
+    for k, v in sorted(kwargs.items()):
+        if isinstance(v, (list, tuple)):
+            if not all(_is_plain(x) for x in v):
+                return None
+            v = tuple(v)
+        elif not _is_plain(v):
+            return None
+        items.append((k, v))
+    return (filename, tuple(items))
+
+def _load_dataset(filename, copy=True, **kwargs):
     """
     Load a dataset from libsurv.datasets
 
     Parameters
     ----------
     filename : str
-        File path of dataset, for example "whas_train.csv".
+        File name of dataset, for example "whas_train.parquet". The parquet
+        file is read if it exists and a parquet engine is installed, otherwise
+        the csv file with the same name is read.
+    copy : bool
+        If true (default), return an independent copy of the cached dataset.
+        Otherwise a shallow copy sharing data with the cache is returned, so
+        values must not be modified in place.
     usecols : list
         list of columns in file to use.
 
@@ -36,33 +112,99 @@ def _load_dataset(filename, **kwargs):
     -------
     DataFrame
         dataset.
+
+    Notes
+    -----
+    Parsed datasets are cached in memory, so repeated loading with the same
+    arguments does not read the file again.
     """
-    return pd.read_csv(resource_filename("libsurv", "datasets/src/" + filename), engine="python", **kwargs)
+    key = _cache_key(filename, kwargs)
+    if key is not None and key in _DATASET_CACHE:
+        return _DATASET_CACHE[key].copy(deep=copy)
+
+    data = None
+    name = os.path.splitext(filename)[0]
+    dtype = _DATASET_DTYPES[name.split("_")[0]]
+    file_columns = _DATASET_COLUMNS[name.split("_")[0]]
+    parquet_path = os.path.join(_DATA_DIR, name + ".parquet")
+    usecols = kwargs.get("usecols")
+    # Parquet file only supports the selection of columns by existing names,
+    # others (callables, positions, unknown names) are left to `read_csv`
+    if (os.path.exists(parquet_path) and set(kwargs) <= {"usecols"} and
+            (usecols is None or (isinstance(usecols, (list, tuple)) and
+                                 all(isinstance(c, str) and c in file_columns for c in usecols)))):
+        columns = None
+        if usecols is not None:
+            # keep the order of columns in file, the same as `read_csv`
+            columns = [c for c in file_columns if c in usecols]
+        try:
+            data = pd.read_parquet(parquet_path, columns=columns)
+        except ImportError:
+            # No parquet engine (pyarrow or fastparquet) installed
+            data = None
+    if data is None:
+        # map the small file into memory and parse it in a single pass
+        options = dict(engine="c", dtype=dtype, na_filter=False, low_memory=False, memory_map=True)
+        options.update(kwargs)
+        data = pd.read_csv(os.path.join(_DATA_DIR, name + ".csv"), **options)
+    if key is not None:
+        _DATASET_CACHE[key] = data
+        return data.copy(deep=copy)
+    return data
 
 def load_metabric_train(**kwargs):
     """
     Load a training dataset of METABRIC
 
+    Parameters
+    ----------
+    copy : bool
+        If true (default), return an independent copy of the in-memory cache. If
+        false, the returned DataFrame shares its data with the cache used by later
+        loads, so its values must not be modified in place.
+    usecols : list
+        list of columns in file to use.
+
     Notes
     -----
     See `load_metabric` for more details.
     """
-    return _load_dataset("metabric_train.csv", **kwargs)
+    return _load_dataset("metabric_train.parquet", **kwargs)
 
 def load_metabric_test(**kwargs):
     """
     Load a test dataset of METABRIC
 
+    Parameters
+    ----------
+    copy : bool
+        If true (default), return an independent copy of the in-memory cache. If
+        false, the returned DataFrame shares its data with the cache used by later
+        loads, so its values must not be modified in place.
+    usecols : list
+        list of columns in file to use.
+
     Notes
     -----
     See `load_metabric` for more details.
     """
-    return _load_dataset("metabric_test.csv", **kwargs)
+    return _load_dataset("metabric_test.parquet", **kwargs)
 
 def load_metabric(**kwargs):
     """
     Load a dataset of METABRIC.
 
+    Parameters
+    ----------
+    usecols : list
+        list of columns in file to use.
+
+    Returns
+    -------
+    DataFrame
+        A new DataFrame merging training and test datasets, which does not share
+        data with the cache of `load_metabric_train` and `load_metabric_test`.
+
     Notes
     -----
     The Molecular Taxonomy of Breast Cancer International Consortium (METABRIC) investigates 
@@ -79,33 +221,61 @@ def load_metabric(**kwargs):
     data_train = load_metabric_train(**kwargs)
     data_test = load_metabric_test(**kwargs)
     # merge into a dataframe
-    data = pd.concat([d_train, d_test], axis=0)
-    return data.reset_index(drop=True)
+    return pd.concat([data_train, data_test], axis=0, ignore_index=True, copy=False)
 
 def load_whas_train(**kwargs):
     """
     Load a training dataset of WHAS
 
+    Parameters
+    ----------
+    copy : bool
+        If true (default), return an independent copy of the in-memory cache. If
+        false, the returned DataFrame shares its data with the cache used by later
+        loads, so its values must not be modified in place.
+    usecols : list
+        list of columns in file to use.
+
     Notes
     -----
     See `load_whas` for more details.
     """
-    return _load_dataset("whas_train.csv", **kwargs)
+    return _load_dataset("whas_train.parquet", **kwargs)
 
 def load_whas_test(**kwargs):
     """
     Load a test dataset of WHAS
 
+    Parameters
+    ----------
+    copy : bool
+        If true (default), return an independent copy of the in-memory cache. If
+        false, the returned DataFrame shares its data with the cache used by later
+        loads, so its values must not be modified in place.
+    usecols : list
+        list of columns in file to use.
+
     Notes
     -----
     See `load_whas` for more details.
     """
-    return _load_dataset("whas_test.csv", **kwargs)
+    return _load_dataset("whas_test.parquet", **kwargs)
 
 def load_whas(**kwargs):
     """
     Load a dataset of WHAS.
 
+    Parameters
+    ----------
+    usecols : list
+        list of columns in file to use.
+
+    Returns
+    -------
+    DataFrame
+        A new DataFrame merging training and test datasets, which does not share
+        data with the cache of `load_whas_train` and `load_whas_test`.
+
     Notes
     -----
     WHAS(the Worcester Heart Attack Study (WHAS) [18] studies the survival of acute myocardial 
@@ -121,8 +291,15 @@ def load_whas(**kwargs):
     data_train = load_whas_train(**kwargs)
     data_test = load_whas_test(**kwargs)
     # merge into a dataframe
-    data = pd.concat([d_train, d_test], axis=0)
-    return data.reset_index(drop=True)
+    return pd.concat([data_train, data_test], axis=0, ignore_index=True, copy=False)
+
+@functools.lru_cache(maxsize=32)
+def _simulated_columns(num_features):
+    """
+    Column names of simulated data, i.e. 'x_0', ..., 'x_{num_features-1}', 'e' and 't'.
+    A tuple is cached, so that no mutable Index object is shared between DataFrames.
+    """
+    return tuple(['x_' + str(i) for i in range(num_features)] + ['e', 't'])
 
 def load_simulated_data(hr_ratio,
         N=1000, num_features=10, num_var=2,
@@ -169,14 +346,16 @@ def load_simulated_data(hr_ratio,
     generator = SimulatedData(hr_ratio, average_death=average_death, end_time=end_time, 
                               num_features=num_features, num_var=num_var)
     raw_data = generator.generate_data(N, method=method, gaussian_config=gaussian_config, seed=seed)
-    # To DataFrame
-    df = pd.DataFrame(raw_data['x'], columns=['x_' + str(i) for i in range(num_features)])
-    df['e'] = raw_data['e']
-    df['t'] = raw_data['t']
-    return df
+    # To DataFrame, built at once from columns
+    columns = _simulated_columns(num_features)
+    x = np.ascontiguousarray(raw_data['x'].T)
+    cols = dict(zip(columns[:num_features], x))
+    cols['e'] = raw_data['e']
+    cols['t'] = raw_data['t']
+    return pd.DataFrame(cols, columns=list(columns), copy=False)
 
 def load_data(file_path, t_col='t', e_col='e', excluded_cols=[],
-              split_ratio=1.0, normalize=False, seed=42):
+              split_ratio=1.0, normalize=False, seed=42, chunksize=None, verbose=False):
     """
     load csv file and return standard survival data for traning or testing.
 
@@ -194,48 +373,69 @@ def load_data(file_path, t_col='t', e_col='e', excluded_cols=[],
         If `split_ratio` is set to 1.0, then full data will be obtained. Otherwise, the 
         splitted data will be returned.
     normalize: bool
-        If true, then data will be normalized by the equation x = (x - meam / std).
+        If true, then data will be normalized by the equation x = (x - mean) / (max - min).
+        Constant columns are only centered.
     seed: int
         Random seed for splitting data.
+    chunksize: int
+        If set, the csv file is read by chunks of `chunksize` rows, whose feature
+        columns are cast to float32, to reduce peak memory on large files.
+    verbose: bool
+        If true, print the number of rows and columns of training data.
 
     Returns
     ------
     pandas.DataFrame
         Or tuple of two DataFrames if split_ratio is less than 1.0.
     """
-    # Read csv data
-    data_all = pd.read_csv(filename)
-    
-    # list columns out
+    # list columns out from the header, so that excluded columns are never parsed
+    header = pd.read_csv(file_path, nrows=0).columns
     Y_cols = [t_col, e_col]
     _not_int_x_cols = Y_cols + excluded_cols
-    X_cols = [x for x in data_all.columns if x not in _not_int_x_cols]
+    X_cols = [x for x in header if x not in _not_int_x_cols]
+    usecols = [x for x in header if x not in excluded_cols]
+
+    # Read csv data
+    if chunksize is not None:
+        # only features are cast, labels keep their parsed dtypes
+        chunks = [c[X_cols + Y_cols].astype(dict.fromkeys(X_cols, np.float32)) for c in
+                  pd.read_csv(file_path, engine="c", usecols=usecols, chunksize=chunksize)]
+        # concatenate only once, at the end
+        data_all = pd.concat(chunks, ignore_index=True, copy=False)
+    else:
+        engine = "pyarrow" if _PYARROW_CSV else "c"
+        data_all = pd.read_csv(file_path, engine=engine, usecols=usecols)
 
     X = data_all[X_cols]
     y = data_all[Y_cols]
 
     # Normalized data
     if normalize:
-        for col in X_cols:
-            X.loc[:, col] = (X.loc[:, col] - X.loc[:, col].mean()) / (X.loc[:, col].max() - X.loc[:, col].min())
+        # `copy=True` keeps `data_all` untouched by the in-place operations
+        vals = X.to_numpy(dtype=np.float32, copy=True)
+        # statistics skip missing values, the same as pandas
+        range_ = np.nanmax(vals, axis=0) - np.nanmin(vals, axis=0)
+        vals -= np.nanmean(vals, axis=0)
+        vals /= np.where(range_ == 0, 1, range_)
+        X = pd.DataFrame(vals, columns=X_cols, index=X.index)
     
     # Split data
     if split_ratio == 1.0:
         train_X, train_y = X, y
     else:
+        from sklearn.model_selection import ShuffleSplit
         sss = ShuffleSplit(n_splits=1, test_size=1 - split_ratio, random_state=seed)
         for train_index, test_index in sss.split(X, y):
-            train_X, test_X = X.loc[train_index, :], X.loc[test_index, :]
-            train_y, test_y = y.loc[train_index, :], y.loc[test_index, :]
+            train_X, test_X = X.iloc[train_index], X.iloc[test_index]
+            train_y, test_y = y.iloc[train_index], y.iloc[test_index]
 
     # print infos of training data
-    print("# rows: ", len(train_X))
-    print("# x_cols: ", len(train_X.columns))
-    print("# y_cols: ", len(train_y.columns))
-    print("X columns:", train_X.columns)
-    print("Y columns:", train_y.columns)
+    if verbose:
+        print("# rows: ", len(train_X))
+        print("# x_cols: ", len(train_X.columns))
+        print("# y_cols: ", len(train_y.columns))
 
     if split_ratio == 1.0:
-        return pd.concat([train_X, train_y], axis=1)
+        return pd.concat([train_X, train_y], axis=1, copy=False)
     else:
-        return pd.concat([train_X, train_y], axis=1), pd.concat([test_X, test_y], axis=1)
\ No newline at end of file
+        return pd.concat([train_X, train_y], axis=1, copy=False), pd.concat([test_X, test_y], axis=1, copy=False)
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Convert the bundled csv datasets into parquet files.
+
+Run `python -m libsurv.datasets._convert` once after the csv files in
+`libsurv/datasets/src/` have been changed.
+"""
+import os
+import pandas as pd
+
+from . import _DATA_DIR, _DATASET_DTYPES
+
+FILENAMES = [
+    "metabric_train",
+    "metabric_test",
+    "whas_train",
+    "whas_test"
+]
+
+def csv_to_parquet(name):
+    """
+    Convert a dataset from csv into parquet with snappy compression.
+
+    Parameters
+    ----------
+    name : str
+        File name of dataset without extension, for example "whas_train".
+    """
+    dtype = _DATASET_DTYPES[name.split("_")[0]]
+    data = pd.read_csv(os.path.join(_DATA_DIR, name + ".csv"), engine="c",
+                       dtype=dtype, na_filter=False, low_memory=False)
+    data.to_parquet(os.path.join(_DATA_DIR, name + ".parquet"), compression="snappy")
+
+if __name__ == "__main__":
+    for name in FILENAMES:
+        csv_to_parquet(name)